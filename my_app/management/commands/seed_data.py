@@ -1,12 +1,16 @@
 # my_app/management/commands/seed_data.py
+import csv
+import io
 import json
 import math
 import random
-from datetime import datetime, date, timedelta
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime, timedelta
 from pathlib import Path
 
+import numpy as np
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from django.db import connection, models, transaction
 from django.utils import timezone
 
 
@@ -35,50 +39,53 @@ def partition_into_teams(num_students: int, min_team: int, max_team: int, rng: r
         return []
     if num_students < min_team:
         return [num_students]
-    lower_bound = max(1, num_students // max_team)
+    # Aim for the average team size, clamped to a team count that keeps every
+    # team within [min_team, max_team]
     approx_teams = max(1, round(num_students / ((min_team + max_team) / 2)))
-    team_count = max(lower_bound, approx_teams)
-    sizes = [min_team] * team_count
-    assigned = min_team * team_count
-    while assigned < num_students:
-        idxs = list(range(team_count))
-        rng.shuffle(idxs)
-        progressed = False
-        for i in idxs:
-            if sizes[i] < max_team and assigned < num_students:
-                sizes[i] += 1
-                assigned += 1
-                progressed = True
-            if assigned >= num_students:
-                break
-        if not progressed:
-            remain = num_students - assigned
-            if remain <= 0:
-                break
-            add = min(max(remain, min_team), max_team)
-            sizes.append(add)
-            assigned += add
-            team_count += 1
-    if assigned > num_students:
-        overflow = assigned - num_students
-        for i in range(team_count - 1, -1, -1):
-            take = min(overflow, sizes[i] - min_team)
-            sizes[i] -= take
-            overflow -= take
-            if overflow == 0:
-                break
+    team_count = max(
+        math.ceil(num_students / max_team),
+        min(approx_teams, num_students // min_team),
+    )
+    # Spread students evenly: the first r teams get one extra, then shuffle
+    # once so the larger teams land at random positions
+    q, r = divmod(num_students, team_count)
+    sizes = [q + 1] * r + [q] * (team_count - r)
+    rng.shuffle(sizes)
     assert sum(sizes) == num_students, f"partition failed: {sizes} vs {num_students}"
     return sizes
 
-def biased_score(rng: random.Random, max_score: int = 5):
-    # Triangular bias toward higher scores
-    a = rng.triangular(1, max_score, max_score)
-    return max(1, min(max_score, int(round(a))))
+def biased_scores(np_rng: np.random.Generator, size: int, max_score: int = 5):
+    # Triangular bias toward higher scores, drawn in a single vectorized call
+    a = np_rng.triangular(1, max_score, max_score, size=size)
+    return np.clip(np.rint(a), 1, max_score).astype(np.int8)
 
 def chunk_list(items, n):
     for i in range(0, len(items), n):
         yield items[i:i+n]
 
+LIKERT_PROMPTS = [
+    "Contributed fair share",
+    "Communicated effectively",
+    "Met deadlines",
+    "Showed leadership",
+    "Quality of work",
+]
+
+CSV_HEADERS = {
+    "users": ["id", "email", "name", "role"],
+    "courses": ["id", "course_number", "course_name", "semester", "year", "teacher_id"],
+    "course_members": ["id", "course_id", "user_id"],
+    "teams": ["id", "course_id", "team_name"],
+    "team_members": ["id", "team_id", "course_member_id"],
+    "assessments": ["id", "course_id", "title", "status", "publish_date", "due_date", "results_released"],
+    "assessment_questions": ["id", "assessment_id", "question_type", "content"],
+    "assessment_responses": ["id", "assessment_id", "from_user_id", "to_user_id", "answers", "submitted"],
+}
+
+# Rows are buffered across courses and written once this many peer responses
+# have piled up (or at the end of the run)
+FLUSH_ROWS = 10000
+
 
 class Command(BaseCommand):
     help = (
@@ -99,6 +106,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **opt):
         rng = random.Random(opt["seed"])
+        np_rng = np.random.default_rng(opt["seed"])
 
         if opt["purge"]:
             self._purge()
@@ -112,84 +120,130 @@ class Command(BaseCommand):
         if export:
             outdir = Path(opt["export_csv"])
             outdir.mkdir(parents=True, exist_ok=True)
-            csv_rows = {
-                "users": [],
-                "courses": [],
-                "course_members": [],
-                "teams": [],
-                "team_members": [],
-                "assessments": [],
-                "assessment_questions": [],
-                "assessment_responses": [],
-            }
 
-        open_at  = datetime(date.today().year, 10, 1, 9, 0, tzinfo=timezone.get_current_timezone())
-        close_at = datetime(date.today().year, 10, 31, 23, 59, tzinfo=timezone.get_current_timezone())
+        # assessment window follows the --year being seeded, not today's date
+        tz = timezone.get_current_timezone()
+        year = opt["year"]
+        open_at  = datetime(year, 10, 1, 9, 0, tzinfo=tz)
+        close_at = datetime(year, 10, 31, 23, 59, tzinfo=tz)
 
         progress_every = max(1, courses_target // 20)
 
-        with transaction.atomic():
-            for idx in range(courses_target):
-                # teacher
-                prof_email = f"teacher+{idx+1}@faculty.example.edu"
-                teacher = User.objects.create(
-                    email=prof_email,
-                    name=f"Prof {idx+1}",
-                    role="teacher",
-                )
-                if export:
-                    csv_rows["users"].append([str(teacher.id), teacher.email, teacher.name, teacher.role])
-
-                # course
-                course_number = f"CS{1000 + idx:04d}"
-                course = Course.objects.create(
+        # Pending inserts, keyed in parent -> child order so a flush never
+        # writes a row before the row it points at
+        pending = {
+            User: [],
+            CourseMember: [],
+            Team: [],
+            TeamMember: [],
+            AssessmentResponse: [],
+        }
+
+        # CSV rows are streamed to disk as they are generated; the files only
+        # take their final names once the seeding transaction has committed
+        csv_exports = self._csv_exports(outdir) if export else nullcontext()
+        with csv_exports as csv_out, transaction.atomic():
+            dropped_indexes = self._drop_response_indexes()
+
+            # teachers and courses don't depend on anything generated per
+            # course, so insert them all up front
+            teachers = [
+                User(email=f"teacher+{i+1}@faculty.example.edu", name=f"Prof {i+1}", role="teacher")
+                for i in range(courses_target)
+            ]
+            User.objects.bulk_create(teachers, batch_size=2000)
+
+            courses = []
+            for i, t in enumerate(teachers):
+                course_number = f"CS{1000 + i:04d}"
+                courses.append(Course(
                     course_number=course_number,
                     course_name=f"Course {course_number}",
                     course_semester=opt["semester"],
                     course_year=str(opt["year"]),
-                    teacher=teacher,
+                    teacher=t,
+                ))
+            Course.objects.bulk_create(courses, batch_size=2000)
+
+            # every course gets one identical published assessment
+            assessments = [
+                Assessment(
+                    course=c,
+                    title=f"{c.course_number} – Peer Review 1",
+                    status="published",
+                    publish_date=open_at,
+                    due_date=close_at,
+                    results_released=False,
                 )
+                for c in courses
+            ]
+            Assessment.objects.bulk_create(assessments, batch_size=2000)
+
+            # ...with the same likert prompts, so cross-join them in one pass
+            n_prompts = len(LIKERT_PROMPTS)
+            all_questions = [
+                AssessmentQuestion(assessment=a, question_type="likert", content=p)
+                for a in assessments for p in LIKERT_PROMPTS
+            ]
+            AssessmentQuestion.objects.bulk_create(all_questions, batch_size=5000)
+
+            # class sizes come from one vectorized draw; shuffle is bound once
+            # instead of being looked up per course
+            course_sizes = np_rng.integers(students_min, students_max + 1, size=courses_target).tolist()
+            _shuffle = rng.shuffle
+            for idx in range(courses_target):
+                # teacher
+                teacher = teachers[idx]
                 if export:
-                    csv_rows["courses"].append([
+                    csv_out["users"].writerow([str(teacher.id), teacher.email, teacher.name, teacher.role])
+
+                # course
+                course = courses[idx]
+                if export:
+                    csv_out["courses"].writerow([
                         str(course.id), course.course_number, course.course_name,
                         course.course_semester, course.course_year, str(teacher.id)
                     ])
 
                 # students
-                num_students = rng.randint(students_min, students_max)
+                num_students = course_sizes[idx]
+                cn = course.course_number
+                email_prefix = f"student+{cn}-"
+                name_prefix = f"Student {cn}-"
                 students = [
-                    User(email=f"student+{course.course_number}-{j+1}@student.example.edu",
-                         name=f"Student {course.course_number}-{j+1}",
+                    User(email=f"{email_prefix}{j}@student.example.edu",
+                         name=f"{name_prefix}{j}",
                          role="student")
-                    for j in range(num_students)
+                    for j in range(1, num_students + 1)
                 ]
-                User.objects.bulk_create(students, batch_size=1000)
-                students = list(User.objects.filter(
-                    email__startswith=f"student+{course.course_number}-", role="student"
-                ).order_by("email"))
+                pending[User].extend(students)
+                if export:
+                    csv_out["users"].writerows(
+                        [str(st.id), st.email, st.name, st.role] for st in students
+                    )
 
                 members = [CourseMember(course=course, user=s) for s in students]
-                CourseMember.objects.bulk_create(members, batch_size=1000)
-                members = list(CourseMember.objects.filter(course=course).select_related("user").order_by("id"))
+                pending[CourseMember].extend(members)
 
                 if export:
-                    for cm in members:
-                        csv_rows["course_members"].append([str(cm.id), str(course.id), str(cm.user.id)])
+                    csv_out["course_members"].writerows(
+                        [str(cm.id), str(course.id), str(cm.user.id)] for cm in members
+                    )
 
                 # teams
                 sizes = partition_into_teams(num_students, team_min, team_max, rng)
-                rng.shuffle(members)
+                _shuffle(members)
                 pos = 0
-                teams = []
-                for tnum, sz in enumerate(sizes, start=1):
-                    t = Team(course=course, team_name=f"Team {tnum:02d}")
-                    teams.append(t)
-                Team.objects.bulk_create(teams, batch_size=500)
-                teams = list(Team.objects.filter(course=course).order_by("id"))
-
-                tm_rows = []
-                for team in teams:
-                    pass
+                teams = [
+                    Team(course=course, team_name=f"Team {tnum:02d}")
+                    for tnum in range(1, len(sizes) + 1)
+                ]
+                pending[Team].extend(teams)
+                if export:
+                    csv_out["teams"].writerows(
+                        [str(t.id), str(course.id), t.team_name] for t in teams
+                    )
+
                 # Assign members chunk-by-chunk
                 team_members_to_create = []
                 for t_idx, team in enumerate(teams):
@@ -198,77 +252,75 @@ class Command(BaseCommand):
                     pos += sz
                     for cm in chunk:
                         team_members_to_create.append(TeamMember(team=team, course_member=cm))
-                TeamMember.objects.bulk_create(team_members_to_create, batch_size=1000)
+                pending[TeamMember].extend(team_members_to_create)
 
                 if export:
-                    for tm in TeamMember.objects.filter(team__course=course).select_related("team", "course_member"):
-                        csv_rows["team_members"].append([str(tm.id), str(tm.team.id), str(tm.course_member.id)])
+                    csv_out["team_members"].writerows(
+                        [str(tm.id), str(tm.team.id), str(tm.course_member.id)]
+                        for tm in team_members_to_create
+                    )
 
                 # assessments 
-                assess = Assessment.objects.create(
-                    course=course,
-                    title=f"{course.course_number} – Peer Review 1",
-                    status="published",
-                    publish_date=open_at,
-                    due_date=close_at,
-                    results_released=False,
-                )
+                assess = assessments[idx]
                 if export:
-                    csv_rows["assessments"].append([
+                    csv_out["assessments"].writerow([
                         str(assess.id), str(course.id), assess.title, assess.status,
                         assess.publish_date.isoformat() if assess.publish_date else "",
                         assess.due_date.isoformat() if assess.due_date else "",
                         str(assess.results_released)
                     ])
 
-                likert_prompts = [
-                    "Contributed fair share",
-                    "Communicated effectively",
-                    "Met deadlines",
-                    "Showed leadership",
-                    "Quality of work",
-                ]
-                questions = [
-                    AssessmentQuestion(
-                        assessment=assess, question_type="likert", content=p
-                    ) for p in likert_prompts
-                ]
-                AssessmentQuestion.objects.bulk_create(questions, batch_size=20)
-                questions = list(AssessmentQuestion.objects.filter(assessment=assess).order_by("id"))
+                questions = all_questions[idx * n_prompts:(idx + 1) * n_prompts]
 
                 if export:
-                    for q in questions:
-                        csv_rows["assessment_questions"].append([
-                            str(q.id), str(assess.id), q.question_type, q.content
-                        ])
+                    csv_out["assessment_questions"].writerows(
+                        [str(q.id), str(assess.id), q.question_type, q.content]
+                        for q in questions
+                    )
 
                 # peer responses
-                # Build team_id -> list[CourseMember]
+                # Build team -> list[User] straight from the in-memory team
+                # members, resolving .user once here rather than per pair
                 by_team = {}
-                for tm in TeamMember.objects.filter(team__course=course).select_related("team", "course_member__user").order_by("team_id"):
-                    by_team.setdefault(tm.team_id, []).append(tm.course_member)
+                for tm in team_members_to_create:
+                    by_team.setdefault(tm.team, []).append(tm.course_member.user)
 
                 # Create responses
-                responses_to_create = []
-                for team_id, cms in by_team.items():
+                responses_to_create = pending[AssessmentResponse]
+                add_response = responses_to_create.append
+                qid_strs = [str(q.id) for q in questions]
+                k = len(qid_strs)
+                total_scores_needed = sum(len(users) * (len(users) - 1) for users in by_team.values()) * k
+                scores = biased_scores(np_rng, total_scores_needed).tolist()
+                cursor = 0
+                first_response = len(responses_to_create)
+                for users in by_team.values():
                     # each student evaluates every other
-                    for i, cm_i in enumerate(cms):
-                        for j, cm_j in enumerate(cms):
+                    for i, u_i in enumerate(users):
+                        for j, u_j in enumerate(users):
                             if i == j:
                                 continue
-                            answers = {}
-                            for q in questions:
-                                answers[str(q.id)] = biased_score(rng, 5)
-                            responses_to_create.append(
+                            answers = dict(zip(qid_strs, scores[cursor:cursor+k]))
+                            cursor += k
+                            add_response(
                                 AssessmentResponse(
                                     assessment=assess,
-                                    from_user=cm_i.user,
-                                    to_user=cm_j.user,
+                                    from_user=u_i,
+                                    to_user=u_j,
                                     answers=answers,
                                     submitted=True,
                                 )
                             )
-                AssessmentResponse.objects.bulk_create(responses_to_create, batch_size=1000)
+                if export:
+                    csv_out["assessment_responses"].writerows(
+                        [
+                            str(ar.id), str(assess.id), str(ar.from_user.id), str(ar.to_user.id),
+                            json.dumps(ar.answers, separators=(",", ":")), str(ar.submitted),
+                        ]
+                        for ar in responses_to_create[first_response:]
+                    )
+                if len(responses_to_create) >= FLUSH_ROWS:
+                    self._flush(pending)
 
                 # progress
                 if (idx + 1) % progress_every == 0 or (idx + 1) == courses_target:
@@ -276,26 +328,14 @@ class Command(BaseCommand):
                         f"Seeded {idx+1}/{courses_target} courses ({(idx+1)/courses_target:.0%})"
                     ))
 
+            self._flush(pending)
+
+        # Rebuilt only once the load has committed: the deferred FK triggers
+        # queued by the inserts must have fired before CREATE INDEX may run.
+        # If seeding fails, the rollback brings the dropped indexes back
+        self._restore_response_indexes(dropped_indexes)
+
         if export:
-            # write CSVs
-            def write_csv(path, header, rows):
-                with open(path, "w", encoding="utf-8", newline="") as f:
-                    f.write(",".join(header) + "\n")
-                    for r in rows:
-                        line = ",".join(map(str, r))
-                        f.write(line + "\n")
-
-            write_csv(outdir / "users.csv", ["id", "email", "name", "role"], csv_rows["users"])
-            write_csv(outdir / "courses.csv", ["id", "course_number", "course_name", "semester", "year", "teacher_id"], csv_rows["courses"])
-            write_csv(outdir / "course_members.csv", ["id", "course_id", "user_id"], csv_rows["course_members"])
-            write_csv(outdir / "teams.csv", ["id", "course_id", "team_name"], csv_rows["teams"])
-            write_csv(outdir / "team_members.csv", ["id", "team_id", "course_member_id"], csv_rows["team_members"])
-            write_csv(outdir / "assessments.csv", ["id", "course_id", "title", "status", "publish_date", "due_date", "results_released"], csv_rows["assessments"])
-            write_csv(outdir / "assessment_questions.csv", ["id", "assessment_id", "question_type", "content"], csv_rows["assessment_questions"])
-            write_csv(outdir / "assessment_responses.csv", ["id", "assessment_id", "from_user_id", "to_user_id", "answers", "submitted"], [
-                [str(ar.id), str(ar.assessment_id), str(ar.from_user_id), str(ar.to_user_id), json.dumps(ar.answers), str(ar.submitted)]
-                for ar in AssessmentResponse.objects.all().only("id","assessment_id","from_user_id","to_user_id","answers","submitted")
-            ])
             manifest = {
                 "level": opt["level"],
                 "semester": f"{opt['semester']} {opt['year']}",
@@ -315,18 +355,116 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS("Seeding complete."))
 
+    @contextmanager
+    def _csv_exports(self, outdir):
+        """csv writers for every export, written under temporary names. They
+        are moved into place if the body completes and removed if it raises,
+        so a rolled-back seed never leaves (partial) exports behind"""
+        partial = {name: outdir / f"{name}.csv.partial" for name in CSV_HEADERS}
+        with ExitStack() as stack:
+            csv_out = {}
+            for name, path in partial.items():
+                f = stack.enter_context(open(path, "w", encoding="utf-8", newline=""))
+                csv_out[name] = csv.writer(f)
+                csv_out[name].writerow(CSV_HEADERS[name])
+            try:
+                yield csv_out
+            except BaseException:
+                stack.close()
+                for path in partial.values():
+                    path.unlink(missing_ok=True)
+                raise
+        for name, path in partial.items():
+            path.replace(outdir / f"{name}.csv")
+
+    def _flush(self, pending):
+        # UUID primary keys are assigned client-side, so FKs between buffered
+        # rows are already valid; only the insert order matters
+        for model, rows in pending.items():
+            if not rows:
+                continue
+            if model is AssessmentResponse and connection.vendor == "postgresql":
+                self._copy_responses(rows)
+            else:
+                model.objects.bulk_create(rows, batch_size=FLUSH_ROWS)
+            rows.clear()
+
+    def _copy_responses(self, rows):
+        # Stream peer responses through COPY instead of multi-row INSERTs;
+        # this skips the ORM's per-row parameter binding on the largest table
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        last_saved = timezone.now().isoformat()
+        for r in rows:
+            writer.writerow([
+                r.id, r.assessment_id, r.from_user_id, r.to_user_id,
+                json.dumps(r.answers), last_saved, r.submitted,
+            ])
+        buf.seek(0)
+        sql = (
+            f"COPY {AssessmentResponse._meta.db_table} "
+            "(id, assessment_id, from_user_id, to_user_id, answers, last_saved, submitted) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+        with connection.cursor() as cur:
+            cur.copy_expert(sql, buf)
+
+    def _drop_response_indexes(self):
+        # Maintaining the FK indexes row by row is a large share of the
+        # response insert cost; drop them for the load and rebuild each with
+        # one sequential scan afterwards. PK and FK constraints stay in place.
+        if connection.vendor != "postgresql":
+            return []
+        table = AssessmentResponse._meta.db_table
+        columns = {
+            f.column: f.name for f in AssessmentResponse._meta.concrete_fields
+            if f.is_relation and f.db_index
+        }
+        with connection.cursor() as cur:
+            constraints = connection.introspection.get_constraints(cur, table)
+        # the plain single-column indexes Django made for those FKs, kept
+        # under their existing names so the rebuild restores them exactly
+        indexes = [
+            models.Index(fields=[columns[info["columns"][0]]], name=name)
+            for name, info in constraints.items()
+            if info["index"] and not info["unique"] and not info["primary_key"]
+            and len(info["columns"]) == 1 and info["columns"][0] in columns
+        ]
+        with connection.schema_editor() as se:
+            for index in indexes:
+                se.remove_index(AssessmentResponse, index)
+        return indexes
+
+    def _restore_response_indexes(self, indexes):
+        if not indexes:
+            return
+        with connection.schema_editor() as se:
+            for index in indexes:
+                se.add_index(AssessmentResponse, index)
+
     def _purge(self):
         self.stdout.write(self.style.WARNING("Purging existing data..."))
-        # Delete in safe dependency order
-        OpenEndedToneAnalysis.objects.all().delete()
-        QuestionAnalysisCache.objects.all().delete()
-        TeamAssessmentAnalysis.objects.all().delete()
-        AssessmentResponse.objects.all().delete()
-        AssessmentQuestion.objects.all().delete()
-        Assessment.objects.all().delete()
-        TeamMember.objects.all().delete()
-        Team.objects.all().delete()
-        CourseMember.objects.all().delete()
-        Course.objects.all().delete()
-        User.objects.all().delete()
-        self.stdout.write(self.style.SUCCESS("Purge completed."))
\ No newline at end of file
+        # Listed in safe dependency order (children first)
+        models = [
+            OpenEndedToneAnalysis,
+            QuestionAnalysisCache,
+            TeamAssessmentAnalysis,
+            AssessmentResponse,
+            AssessmentQuestion,
+            Assessment,
+            TeamMember,
+            Team,
+            CourseMember,
+            Course,
+            User,
+        ]
+        if connection.vendor == "postgresql":
+            # One TRUNCATE instead of a collect + DELETE per model. Note that
+            # TRUNCATE bypasses Django entirely, so no delete signals fire.
+            tables = ", ".join(connection.ops.quote_name(m._meta.db_table) for m in models)
+            with connection.cursor() as cur:
+                cur.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+        else:
+            for model in models:
+                model.objects.all().delete()
+        self.stdout.write(self.style.SUCCESS("Purge completed."))
@@ -1,27 +1,184 @@
 # conftest.py
+import hashlib
 import os
+import sqlite3
+from pathlib import Path
+
+import django
 import pytest
+from django.conf import settings
 from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.backends.signals import connection_created
+
+# Table inside the test DB holding the fingerprint of the seed it contains; only
+# useful when the DB itself outlives the run (pytest --reuse-db with
+# TEST_DB_FILE set, or a server DB). It is not a model, so flush leaves it alone
+SEED_MARKER_TABLE = "pytest_seed_marker"
+# SQLite copies of a freshly seeded test DB, restored instead of re-seeding
+SEED_SNAPSHOT_DIR = Path(__file__).resolve().parents[2] / ".pytest_seed_snapshots"
+
+
+def _seed_fingerprint(level, semester, year):
+    from my_app.management.commands import seed_data
+
+    # the schema sources are part of the key: a snapshot holds the schema too,
+    # built from every installed app's models, so pinned versions count as well
+    app_dir = Path(__file__).resolve().parents[1]
+    schema_files = [
+        app_dir / "models.py",
+        *sorted((app_dir / "migrations").glob("*.py")),
+        app_dir.parent / "requirements.txt",
+    ]
+    digest = hashlib.sha256(Path(seed_data.__file__).read_bytes())
+    for f in schema_files:
+        if f.exists():
+            digest.update(f.read_bytes())
+    digest.update(f"django={django.get_version()};apps={','.join(settings.INSTALLED_APPS)}".encode())
+    digest.update(f"level={level};semester={semester};year={year}".encode())
+    return digest.hexdigest()
+
+
+def _read_seed_marker():
+    try:
+        with connection.cursor() as cur:
+            cur.execute(f"SELECT fingerprint FROM {SEED_MARKER_TABLE}")
+            row = cur.fetchone()
+    except DatabaseError:
+        return None
+    return row[0] if row else None
+
+
+def _write_seed_marker(fingerprint):
+    with connection.cursor() as cur:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {SEED_MARKER_TABLE} (fingerprint varchar(64) NOT NULL)")
+        cur.execute(f"DELETE FROM {SEED_MARKER_TABLE}")
+        cur.execute(f"INSERT INTO {SEED_MARKER_TABLE} (fingerprint) VALUES (%s)", [fingerprint])
+
+
+def _fast_test_db(sender, connection, **kwargs):
+    # Test DBs are throwaway, so trade durability for faster seeding commits;
+    # conftest is only imported by pytest so this never touches other DBs.
+    # SQLite gets the equivalent PRAGMAs from settings_test's init_command
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cur:
+            cur.execute("SET synchronous_commit TO OFF")
+
+
+connection_created.connect(_fast_test_db)
+
+
+# Selenium drivers shared by the browser test modules: one browser for the
+# whole run (REUSE_DRIVER=0 restores one per class), reset between tests
+REUSE_DRIVER = os.environ.get("REUSE_DRIVER", "1") == "1"
+DEFAULT_WINDOW_SIZE = (1366, 900)
+
+
+def driver_scope(fixture_name, config):
+    return "session" if REUSE_DRIVER else "class"
+
+
+@pytest.fixture(autouse=True)
+def _reset_driver_state(request):
+    """Clear cookies/storage after each test so a shared driver starts clean.
+    Classes that set KEEP_PAGE stay on their page for the next test."""
+    yield
+    if "driver" not in request.fixturenames:
+        return
+    try:
+        drv = request.getfixturevalue("driver")
+    except (Exception, pytest.skip.Exception, pytest.fail.Exception):
+        # the driver never came up; its setup already reported why
+        return
+    drv.execute_script(
+        "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+    )
+    drv.delete_all_cookies()
+    drv.set_window_size(*DEFAULT_WINDOW_SIZE)
+    if not getattr(request.cls, "KEEP_PAGE", False):
+        drv.get("about:blank")
+
+
+def _ensure_seeded(level, semester, year):
+    """Make the test DB hold the seed for these parameters, reusing what is
+    already there when possible; needs DB access unblocked"""
+    from my_app.models import Course
+
+    fingerprint = _seed_fingerprint(level, semester, year)
+    seeded = (level, semester, year)
+
+    # Skip re-seeding when the DB already holds data from an identical
+    # seed_data.py + parameters; an empty DB (e.g. :memory:, or one flushed by
+    # a live_server test) never counts
+    if _read_seed_marker() == fingerprint and Course.objects.exists():
+        print("Reusing seeded dataset (session fixture):", Course.objects.count())
+        return seeded
+
+    use_snapshot = (
+        connection.vendor == "sqlite"
+        and os.environ.get("TEST_SEED_SNAPSHOT", "1") == "1"
+    )
+    snapshot = SEED_SNAPSHOT_DIR / f"seed_{fingerprint[:16]}.sqlite3"
+
+    if use_snapshot and snapshot.exists():
+        # Page-level copy of the seeded DB; replaces schema, rows and the
+        # seed marker alike
+        connection.ensure_connection()
+        src = sqlite3.connect(snapshot)
+        try:
+            src.backup(connection.connection)
+        finally:
+            src.close()
+        print("Restored seeded dataset from snapshot:", Course.objects.count())
+        return seeded
+
+    # Purge then seed
+    call_command(
+        "seed_data",
+        "--level", str(level),
+        "--semester", semester,
+        "--year", str(year),
+        "--purge",
+    )
+    _write_seed_marker(fingerprint)
+
+    if use_snapshot:
+        SEED_SNAPSHOT_DIR.mkdir(exist_ok=True)
+        for stale in SEED_SNAPSHOT_DIR.glob("seed_*.sqlite3"):
+            if stale != snapshot:
+                stale.unlink(missing_ok=True)
+        # write under a per-process name and rename into place, so xdist
+        # workers seeding at the same time never see a half-written file
+        partial = snapshot.with_name(f"{snapshot.name}.{os.getpid()}.tmp")
+        with connection.cursor() as cur:
+            cur.execute("VACUUM INTO %s", [str(partial)])
+        os.replace(partial, snapshot)
+
+    # need this since course was none when going through on of scheduler tests
+    print("Seeded courses (session fixture):", Course.objects.count())
+    return seeded
+
+
+@pytest.fixture(scope="session")
+def ensure_seeded(django_db_setup, django_db_blocker):
+    """Callable (level, semester, year) -> seeded tuple, for fixtures that need
+    a particular seed; use it from session-scoped fixtures, outside any test
+    transaction"""
+    def _seed(level, semester, year):
+        with django_db_blocker.unblock():
+            return _ensure_seeded(level, semester, year)
+    return _seed
+
 
 @pytest.fixture(scope="session", autouse=True)
-def seed_dataset(django_db_setup, django_db_blocker):
+def seed_dataset(ensure_seeded):
+    """Seed once per session; returns the (level, semester, year) seeded, or
+    None when seeding is skipped"""
     if os.environ.get("TEST_SKIP_SEED", "0") == "1":
-        return
+        return None
 
-    level = int(os.environ.get("TEST_SEED_LEVEL", "1"))
-    semester = os.environ.get("TEST_SEED_SEMESTER", "Fall")
-    year = int(os.environ.get("TEST_SEED_YEAR", "2025"))
-
-    with django_db_blocker.unblock():
-        # Purge then seed once for the whole pytest session
-        call_command(
-            "seed_data",
-            "--level", str(level),
-            "--semester", semester,
-            "--year", str(year),
-            "--purge",
-        )
-
-        # need this since course was none when going through on of scheduler tests
-        from my_app.models import Course
-        print("Seeded courses (session fixture):", Course.objects.count())
\ No newline at end of file
+    return ensure_seeded(
+        int(os.environ.get("TEST_SEED_LEVEL", "1")),
+        os.environ.get("TEST_SEED_SEMESTER", "Fall"),
+        int(os.environ.get("TEST_SEED_YEAR", "2025")),
+    )
@@ -1,16 +1,46 @@
 # test_accessibility.py
 import os
+import copy
 import json
+import shutil
+import signal
 import subprocess
+import tempfile
+import threading
+from collections import deque
 import pytest
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from axe_selenium_python import Axe
+from axe_selenium_python.axe import _DEFAULT_SCRIPT as _AXE_SCRIPT_PATH
+
+from conftest import driver_scope
 
 # Configuration
 HEADLESS = os.environ.get("HEADLESS", "1") == "1"
+# PATH lookup done once at import rather than spawning `which` at collection
+_HAS_PA11Y = shutil.which("pa11y-ci") is not None
+PA11Y_CONFIG_PATH = ".pa11yci.json"
+PA11Y_TIMEOUT_S = 300
+# Only the tail of pa11y-ci's output is kept for the failure message
+PA11Y_OUTPUT_MAX_LINES = 500
+
+def _load_pa11y_config():
+    if not _HAS_PA11Y or not os.path.exists(PA11Y_CONFIG_PATH):
+        return None
+    with open(PA11Y_CONFIG_PATH, "r") as f:
+        return json.load(f)
+
+_PA11Y_CONFIG = _load_pa11y_config()
+
+def _kill_pa11y(proc):
+    """Kill pa11y-ci and its headless browsers; a no-op once they are gone"""
+    try:
+        # started in its own session, so its process group is the whole tree
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        proc.kill()
 
-@pytest.fixture(scope="class")
+@pytest.fixture(scope=driver_scope)
 def driver():
     """Set up Chrome driver with accessibility-friendly options"""
     opts = webdriver.ChromeOptions()
@@ -26,25 +56,45 @@ def driver():
 
 pytestmark = pytest.mark.django_db
 
+# axe-core source, read once instead of on every Axe.inject()
+with open(_AXE_SCRIPT_PATH, "r", encoding="utf8") as _f:
+    _AXE_SOURCE = _f.read()
+
+# Known structural issues that need HTML restructuring; disabled up front so
+# axe doesn't spend time on rules whose results would be thrown away
+AXE_OPTIONS = {
+    "rules": {
+        "landmark-one-main": {"enabled": False},
+        "region": {"enabled": False},
+        "page-has-heading-one": {"enabled": False},
+    },
+}
+# Axe.run() pastes options into the script with %s, so hand it JSON
+_AXE_OPTIONS_JSON = json.dumps(AXE_OPTIONS)
+
+def _inject_axe(driver):
+    """Inject axe-core unless the current page already has it"""
+    if not driver.execute_script("return !!window.axe"):
+        driver.execute_script(_AXE_SOURCE)
+
 
 class TestAccessibilityAxe:
     """Automated accessibility tests using Axe core - excluding known structural issues"""
     
+    # Each page scan is its own xdist group, so `pytest -n 3 --dist=loadgroup`
+    # runs them side by side, one browser per worker
+    @pytest.mark.xdist_group("axe_homepage")
     def test_homepage_accessibility(self, live_server, driver):
         """Test homepage for critical WCAG violations (excluding landmark issues)"""
         driver.get(live_server.url)
         axe = Axe(driver)
         
         # Run axe accessibility checks
-        axe.inject()
-        results = axe.run()
+        _inject_axe(driver)
+        results = axe.run(options=_AXE_OPTIONS_JSON)
         
-        # Filter out landmark-related violations that require HTML restructuring
-        violations = results.get("violations", [])
-        critical_violations = [
-            v for v in violations 
-            if v['id'] not in ['landmark-one-main', 'region', 'page-has-heading-one']
-        ]
+        # Landmark-related rules are disabled in AXE_OPTIONS
+        critical_violations = results.get("violations", [])
         
         if critical_violations:
             violation_details = [
@@ -58,60 +108,61 @@ class TestAccessibilityAxe:
                 + "\n".join(violation_details)
             )
     
+    @pytest.mark.xdist_group("axe_courses")
     def test_courses_page_accessibility(self, live_server, driver):
         """Test courses listing page for critical WCAG violations"""
         driver.get(f"{live_server.url}/courses/")
         axe = Axe(driver)
         
-        axe.inject()
-        results = axe.run()
+        _inject_axe(driver)
+        results = axe.run(options=_AXE_OPTIONS_JSON)
         
-        # Filter out known structural issues
-        violations = [
-            v for v in results.get("violations", [])
-            if v['id'] not in ['landmark-one-main', 'region', 'page-has-heading-one']
-        ]
+        # Known structural issues are disabled in AXE_OPTIONS
+        violations = results.get("violations", [])
         
         assert len(violations) == 0, (
             f"Courses page has {len(violations)} critical accessibility violations"
         )
     
+    @pytest.mark.xdist_group("axe_assessments")
     def test_assessments_page_accessibility(self, live_server, driver):
         """Test assessments page for critical WCAG violations"""
         driver.get(f"{live_server.url}/assessments/")
         axe = Axe(driver)
         
-        axe.inject()
-        results = axe.run()
+        _inject_axe(driver)
+        results = axe.run(options=_AXE_OPTIONS_JSON)
         
-        # Filter out known structural issues
-        violations = [
-            v for v in results.get("violations", [])
-            if v['id'] not in ['landmark-one-main', 'region', 'page-has-heading-one']
-        ]
+        # Known structural issues are disabled in AXE_OPTIONS
+        violations = results.get("violations", [])
         
         assert len(violations) == 0, (
             f"Assessments page has {len(violations)} critical accessibility violations"
         )
 
 
+# One xdist group, so the shared driver and the single homepage load stay on
+# one worker instead of being repeated on each
+@pytest.mark.xdist_group("a11y-manual")
 class TestAccessibilityManual:
     """Manual accessibility tests following WCAG guidelines"""
     
+    # Every check here only reads the homepage, so it is loaded once per class
+    KEEP_PAGE = True
+
+    @pytest.fixture(scope="class", autouse=True)
+    def _open_home(self, driver, live_server):
+        if driver.current_url.rstrip("/") != live_server.url:
+            driver.get(live_server.url)
+    
     def test_images_have_alt_text(self, live_server, driver):
         """Verify all informative images have alt text (WCAG 1.1.1)"""
-        driver.get(live_server.url)
-        
-        images = driver.find_elements(By.TAG_NAME, "img")
-        images_without_alt = []
-        
-        for img in images:
-            alt = img.get_attribute("alt")
-            src = img.get_attribute("src")
-            
-            # Check if image is decorative (empty alt is OK) or informative (needs alt)
-            if alt is None:
-                images_without_alt.append(src)
+        # Decorative images may use an empty alt; only a missing alt fails
+        images_without_alt = driver.execute_script(
+            "return Array.from(document.images)"
+            ".filter(i => i.getAttribute('alt') === null)"
+            ".map(i => i.src).slice(0, 50);"
+        )
         
         assert not images_without_alt, (
             f"Found {len(images_without_alt)} images without alt attribute: "
@@ -120,30 +171,17 @@ class TestAccessibilityManual:
     
     def test_form_inputs_have_labels(self, live_server, driver):
         """Verify all form inputs have associated labels (WCAG 1.3.1, 3.3.2)"""
-        driver.get(live_server.url)
-        
-        inputs = driver.find_elements(
-            By.CSS_SELECTOR, 
-            "input[type='text'], input[type='email'], input[type='password'], textarea, select"
-        )
-        
-        inputs_without_labels = []
-        
-        for inp in inputs:
-            input_id = inp.get_attribute("id")
-            aria_label = inp.get_attribute("aria-label")
-            aria_labelledby = inp.get_attribute("aria-labelledby")
-            placeholder = inp.get_attribute("placeholder")
-            
-            # Check for label association
-            has_label = False
-            if input_id:
-                labels = driver.find_elements(By.CSS_SELECTOR, f"label[for='{input_id}']")
-                has_label = len(labels) > 0
-            
-            # Accept aria-label, aria-labelledby, or placeholder as alternatives
-            if not has_label and not aria_label and not aria_labelledby and not placeholder:
-                inputs_without_labels.append(inp.get_attribute("name") or inp.get_attribute("type"))
+        # Accept a label[for], aria-label, aria-labelledby, or placeholder
+        inputs_without_labels = driver.execute_script("""
+            const sel = "input[type='text'], input[type='email'], input[type='password'], textarea, select";
+            return Array.from(document.querySelectorAll(sel)).filter(el => {
+                const hasLabel = !!el.id && !!document.querySelector(`label[for="${CSS.escape(el.id)}"]`);
+                return !hasLabel
+                    && !el.getAttribute('aria-label')
+                    && !el.getAttribute('aria-labelledby')
+                    && !el.getAttribute('placeholder');
+            }).map(el => el.getAttribute('name') || el.getAttribute('type') || el.type);
+        """)
         
         assert not inputs_without_labels, (
             f"Found {len(inputs_without_labels)} form inputs without labels or placeholders: "
@@ -152,33 +190,22 @@ class TestAccessibilityManual:
     
     def test_sufficient_color_contrast(self, live_server, driver):
         """Check for sufficient color contrast (WCAG 1.4.3)"""
-        driver.get(live_server.url)
-        
         # This is a basic check - proper contrast testing requires specialized tools
         # We're checking that text elements exist and are visible
-        text_elements = driver.find_elements(By.CSS_SELECTOR, "p, h1, h2, h3, h4, h5, h6, span, a, button")
-        
-        invisible_text = []
-        for element in text_elements[:20]:  # Sample first 20 to avoid performance issues
-            try:
-                if not element.is_displayed():
-                    continue
-                    
-                # Get computed styles
-                color = driver.execute_script(
-                    "return window.getComputedStyle(arguments[0]).color;", 
-                    element
-                )
-                bg_color = driver.execute_script(
-                    "return window.getComputedStyle(arguments[0]).backgroundColor;", 
-                    element
-                )
-                
-                # Very basic check: ensure text is not same color as background
-                if color and bg_color and color == bg_color:
-                    invisible_text.append(element.text[:30])
-            except:
-                continue
+        # Very basic check on the first 20 text elements: text color must differ from background
+        invisible_text = driver.execute_script("""
+            const els = document.querySelectorAll("p, h1, h2, h3, h4, h5, h6, span, a, button");
+            const out = [];
+            for (let i = 0; i < Math.min(els.length, 20); i++) {
+                const el = els[i];
+                if (el.getClientRects().length === 0) continue;
+                const style = window.getComputedStyle(el);
+                if (style.color && style.backgroundColor && style.color === style.backgroundColor) {
+                    out.push((el.innerText || '').slice(0, 30));
+                }
+            }
+            return out;
+        """)
         
         assert not invisible_text, (
             f"Found potentially invisible text elements: {invisible_text}"
@@ -186,25 +213,20 @@ class TestAccessibilityManual:
     
     def test_keyboard_navigation_works(self, live_server, driver):
         """Verify keyboard navigation is functional (WCAG 2.1.1)"""
-        driver.get(live_server.url)
-        
-        # Find all interactive elements
-        interactive = driver.find_elements(
-            By.CSS_SELECTOR,
-            "a, button, input, select, textarea, [tabindex]:not([tabindex='-1'])"
-        )
-        
-        # Check that interactive elements can receive focus
-        focusable_count = 0
-        for element in interactive[:10]:  # Test first 10 elements
-            try:
-                if element.is_displayed() and element.is_enabled():
-                    driver.execute_script("arguments[0].focus();", element)
-                    focused = driver.switch_to.active_element
-                    if focused == element:
-                        focusable_count += 1
-            except:
-                continue
+        # Count how many of the first 10 interactive elements can receive focus
+        focusable_count = driver.execute_script("""
+            const els = document.querySelectorAll(
+                "a, button, input, select, textarea, [tabindex]:not([tabindex='-1'])"
+            );
+            let n = 0;
+            for (let i = 0; i < Math.min(els.length, 10); i++) {
+                const el = els[i];
+                if (el.getClientRects().length === 0 || el.disabled) continue;
+                el.focus();
+                if (document.activeElement === el) n++;
+            }
+            return n;
+        """)
         
         assert focusable_count > 0, (
             "No interactive elements could receive keyboard focus"
@@ -212,14 +234,12 @@ class TestAccessibilityManual:
     
     def test_heading_hierarchy(self, live_server, driver):
         """Verify proper heading hierarchy (WCAG 1.3.1)"""
-        driver.get(live_server.url)
-        
-        headings = []
-        for level in range(1, 7):
-            elements = driver.find_elements(By.CSS_SELECTOR, f"h{level}")
-            for el in elements:
-                if el.is_displayed():
-                    headings.append((level, el.text[:50]))
+        # Visible headings in document order as [level, text]
+        headings = driver.execute_script(
+            "return Array.from(document.querySelectorAll('h1,h2,h3,h4,h5,h6'))"
+            ".filter(h => h.getClientRects().length > 0)"
+            ".map(h => [+h.tagName[1], (h.innerText || '').slice(0, 50)]);"
+        )
         
         if not headings:
             pytest.skip("No headings found on page")
@@ -239,18 +259,13 @@ class TestAccessibilityManual:
     
     def test_page_has_lang_attribute(self, live_server, driver):
         """Verify HTML lang attribute is set (WCAG 3.1.1)"""
-        driver.get(live_server.url)
-        
-        html = driver.find_element(By.TAG_NAME, "html")
-        lang = html.get_attribute("lang")
+        lang = driver.execute_script("return document.documentElement.getAttribute('lang');")
         
         assert lang, "HTML element must have a lang attribute"
         assert len(lang) >= 2, f"Invalid lang attribute: {lang}"
     
     def test_page_has_title(self, live_server, driver):
         """Verify page has descriptive title (WCAG 2.4.2)"""
-        driver.get(live_server.url)
-        
         title = driver.title
         assert title, "Page must have a title"
         assert len(title) > 0, "Page title cannot be empty"
@@ -258,23 +273,16 @@ class TestAccessibilityManual:
     
     def test_buttons_have_accessible_names(self, live_server, driver):
         """Verify all buttons have accessible names (WCAG 4.1.2)"""
-        driver.get(live_server.url)
-        
-        buttons = driver.find_elements(By.TAG_NAME, "button")
-        buttons_without_text = []
-        
-        for btn in buttons:
-            if not btn.is_displayed():
-                continue
-                
-            # Check for text content, aria-label, or aria-labelledby
-            text = btn.text.strip()
-            aria_label = btn.get_attribute("aria-label")
-            aria_labelledby = btn.get_attribute("aria-labelledby")
-            title = btn.get_attribute("title")
-            
-            if not text and not aria_label and not aria_labelledby and not title:
-                buttons_without_text.append(btn.get_attribute("class") or "unnamed-button")
+        # Visible buttons need text content, aria-label, aria-labelledby, or title
+        buttons_without_text = driver.execute_script("""
+            return Array.from(document.getElementsByTagName('button')).filter(btn =>
+                btn.getClientRects().length > 0
+                && !(btn.innerText || '').trim()
+                && !btn.getAttribute('aria-label')
+                && !btn.getAttribute('aria-labelledby')
+                && !btn.getAttribute('title')
+            ).map(btn => btn.getAttribute('class') || 'unnamed-button');
+        """)
         
         assert not buttons_without_text, (
             f"Found {len(buttons_without_text)} buttons without accessible names: "
@@ -283,28 +291,17 @@ class TestAccessibilityManual:
     
     def test_links_have_accessible_names(self, live_server, driver):
         """Verify all links have accessible names (WCAG 2.4.4)"""
-        driver.get(live_server.url)
-        
-        links = driver.find_elements(By.TAG_NAME, "a")
-        links_without_text = []
-        
-        for link in links:
-            if not link.is_displayed():
-                continue
-                
-            # Check for text content, aria-label, or aria-labelledby
-            text = link.text.strip()
-            aria_label = link.get_attribute("aria-label")
-            aria_labelledby = link.get_attribute("aria-labelledby")
-            title = link.get_attribute("title")
-            
-            # Check if link has an image with alt text
-            images = link.find_elements(By.TAG_NAME, "img")
-            has_alt = any(img.get_attribute("alt") for img in images)
-            
-            if not text and not aria_label and not aria_labelledby and not title and not has_alt:
-                href = link.get_attribute("href")
-                links_without_text.append(href or "unnamed-link")
+        # Visible links need text, aria-label, aria-labelledby, title, or an img with alt
+        links_without_text = driver.execute_script("""
+            return Array.from(document.getElementsByTagName('a')).filter(link =>
+                link.getClientRects().length > 0
+                && !(link.innerText || '').trim()
+                && !link.getAttribute('aria-label')
+                && !link.getAttribute('aria-labelledby')
+                && !link.getAttribute('title')
+                && !Array.from(link.getElementsByTagName('img')).some(img => img.getAttribute('alt'))
+            ).map(link => link.href || 'unnamed-link');
+        """)
         
         assert not links_without_text, (
             f"Found {len(links_without_text)} links without accessible names: "
@@ -315,23 +312,15 @@ class TestAccessibilityManual:
 class TestAccessibilityPa11y:
     """Integration tests using Pa11y CLI"""
     
-    @pytest.mark.skipif(
-        subprocess.run(["which", "pa11y-ci"], capture_output=True).returncode != 0,
-        reason="pa11y-ci not installed"
-    )
+    @pytest.mark.skipif(not _HAS_PA11Y, reason="pa11y-ci not installed")
     def test_run_pa11y_ci(self, live_server):
         """Run Pa11y CI accessibility tests"""
-        # Update config with live server URL
-        config_path = ".pa11yci.json"
-        
-        if not os.path.exists(config_path):
+        if _PA11Y_CONFIG is None:
             pytest.skip("Pa11y config file not found")
         
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-        
-        # Update URLs to use live_server
-        temp_config = config.copy()
+        # Update URLs to use live_server; deepcopy so the cached config's
+        # nested url dicts are left untouched
+        temp_config = copy.deepcopy(_PA11Y_CONFIG)
         for url_config in temp_config.get("urls", []):
             url_config["url"] = url_config["url"].replace(
                 "http://localhost:8000", 
@@ -339,21 +328,39 @@ class TestAccessibilityPa11y:
             )
         
         # Write temporary config
-        temp_config_path = "/tmp/pa11yci_test.json"
-        with open(temp_config_path, 'w') as f:
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as f:
             json.dump(temp_config, f, indent=2)
-        
-        # Run pa11y-ci
-        result = subprocess.run(
-            ["pa11y-ci", "--config", temp_config_path],
-            capture_output=True,
-            text=True
-        )
-        
-        # Clean up
-        if os.path.exists(temp_config_path):
+            temp_config_path = f.name
+        
+        # Stream pa11y-ci's output, keeping only its tail. The read loop ends
+        # when pa11y-ci closes stdout, so the deadline is enforced by a timer
+        # that kills the run (and the browsers it started) instead
+        timed_out = threading.Event()
+        proc = None
+        try:
+            proc = subprocess.Popen(
+                ["pa11y-ci", "--config", temp_config_path],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                start_new_session=True,
+            )
+            deadline = threading.Timer(PA11Y_TIMEOUT_S, lambda: (timed_out.set(), _kill_pa11y(proc)))
+            deadline.start()
+            try:
+                output = deque(proc.stdout, maxlen=PA11Y_OUTPUT_MAX_LINES)
+            finally:
+                deadline.cancel()
+        finally:
+            if proc is not None:
+                _kill_pa11y(proc)
+                proc.wait()
+                proc.stdout.close()
             os.remove(temp_config_path)
         
-        assert result.returncode == 0, (
-            f"Pa11y CI found accessibility issues:\n{result.stdout}\n{result.stderr}"
-        )
\ No newline at end of file
+        assert not timed_out.is_set(), (
+            f"pa11y-ci did not finish within {PA11Y_TIMEOUT_S}s:\n" + "".join(output)
+        )
+        assert proc.returncode == 0, (
+            "Pa11y CI found accessibility issues:\n" + "".join(output)
+        )
@@ -1,53 +1,73 @@
 # test_browser_usability.py
 import os
+import statistics
 import time
+from pathlib import Path
 import pytest
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
+from django.test import Client
 from playwright.sync_api import sync_playwright
-
-# Selenium driver setup
-def _make_driver(browser_name: str):
-    browser_name = browser_name.lower()
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from conftest import DEFAULT_WINDOW_SIZE
+
+# All browser checks run on Playwright: one driver process for the run, one
+# browser per engine, and a fresh BrowserContext per test
+HEADLESS = os.getenv("PW_HEADLESS", "1") == "1"
+
+# Engines to run the Playwright tests on, e.g. PW_BROWSERS=chromium,webkit;
+# an engine that isn't installed is skipped with the reason
+PW_BROWSERS = [b.strip() for b in os.getenv("PW_BROWSERS", "chromium,firefox,webkit").split(",") if b.strip()]
+
+# The checks only need the DOM, so image requests are aborted unsent; a glob
+# route keeps every other request off the Python side
+IMAGE_URL_GLOB = "**/*.{png,jpg,jpeg,gif,webp,svg,ico}"
+
+# One Playwright driver process for the whole run, shared by every engine.
+# While sync_playwright is open its event loop counts as running, so Django
+# would refuse every sync ORM call made meanwhile, incl. live_server's flush at
+# each test's teardown; nothing here actually runs on that loop, so lift the
+# check (as pytest-playwright recommends for Django) until the instance closes
+@pytest.fixture(scope="session")
+def playwright_instance():
+    prev = os.environ.get("DJANGO_ALLOW_ASYNC_UNSAFE")
+    os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"] = "true"
     try:
-        if browser_name in ("google", "chrome"):
-            opts = webdriver.ChromeOptions()
-            if os.environ.get("HEADLESS", "1") == "1":
-                opts.add_argument("--headless=new")
-                opts.add_argument("--window-size=1366,900")
-            return webdriver.Chrome(options=opts)
-
-        if browser_name in ("mozilla", "firefox"):
-            opts = webdriver.FirefoxOptions()
-            if os.environ.get("HEADLESS", "1") == "1":
-                opts.add_argument("--headless")
-            return webdriver.Firefox(options=opts)
-
-        # Safari covered by Playwright below
-        if browser_name == "safari":
-            return None
-
-    except Exception:
-        # If driver missing, skip
-        return None
-
-    raise ValueError(f"Unsupported browser: {browser_name}")
-
-SELENIUM_BROWSERS = ["google", "mozilla"]
-
-@pytest.fixture(params=SELENIUM_BROWSERS, scope="class")
-def selenium_browser(request):
-    return request.param
-
-@pytest.fixture(scope="class")
-def driver(selenium_browser):
-    drv = _make_driver(selenium_browser)
-    if drv is None:
-        pytest.skip(f"WebDriver for {selenium_browser} not available or not configured.")
-    yield drv
-    drv.quit()
+        with sync_playwright() as p:
+            yield p
+    finally:
+        if prev is None:
+            os.environ.pop("DJANGO_ALLOW_ASYNC_UNSAFE", None)
+        else:
+            os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"] = prev
+
+# Each engine is its own xdist group, so under --dist=loadgroup one worker
+# owns all tests for an engine and launches that browser only once
+@pytest.fixture(
+    params=[pytest.param(b, marks=pytest.mark.xdist_group(f"playwright-{b}")) for b in PW_BROWSERS],
+    scope="session",
+)
+def pw_browser(request, playwright_instance):
+    engine = getattr(playwright_instance, request.param)
+    # checked once per engine, since the fixture is session-scoped
+    if not Path(engine.executable_path).exists():
+        pytest.skip(
+            f"Playwright {request.param} is not installed ({engine.executable_path} missing); "
+            f"run `playwright install {request.param}`"
+        )
+    browser = engine.launch(headless=HEADLESS)
+    yield browser
+    browser.close()
+
+@pytest.fixture
+def pw_page(pw_browser):
+    """Fresh BrowserContext per test; far cheaper than a new browser, and it
+    starts with no cookies or storage"""
+    width, height = DEFAULT_WINDOW_SIZE
+    ctx = pw_browser.new_context(viewport={"width": width, "height": height})
+    ctx.route(IMAGE_URL_GLOB, lambda route: route.abort())
+    yield ctx.new_page()
+    ctx.close()
 
 pytestmark = pytest.mark.django_db
 
@@ -55,6 +75,22 @@ HOME_PATH = "/"
 FORM_INPUT_SELECTOR = "input[name='q']"
 FORM_SUBMIT_SELECTOR = "button[type='submit']"
 SUCCESS_MARKER_SELECTOR = "[data-test='ok']"
+# Navigations return once the DOM is parsed; tests that need the full load
+# ask for it
+PAGE_READY = "domcontentloaded"
+# Upper bound for explicit waits; they return as soon as the condition holds
+WAIT_TIMEOUT_S = 5
+WAIT_POLL_S = 0.05
+
+def _wait_for(page, expression, arg=None):
+    """page.wait_for_function that reports a timeout as False instead of raising"""
+    try:
+        page.wait_for_function(
+            expression, arg=arg, timeout=WAIT_TIMEOUT_S * 1000, polling=WAIT_POLL_S * 1000
+        )
+        return True
+    except PlaywrightTimeoutError:
+        return False
 
 LEVEL_NAV_THRESHOLDS_MS = {
     "L1": 4000,
@@ -75,86 +111,81 @@ def level_config(level_name):
 
 # Tests 
 class TestBrowserUsability:
-    def test_homepage_loads_and_has_title(self, live_server, driver, level_config):
-        url = live_server.url + HOME_PATH
-        driver.get(url)
-        assert driver.title is not None and driver.title != ""
-
-    def test_layout_is_responsive_basic(self, live_server, driver, level_config):
-        url = live_server.url + HOME_PATH
-        driver.get(url)
-        driver.set_window_size(1366, 800)
-        time.sleep(0.2)
-        width_desktop = driver.execute_script("return document.body.clientWidth;")
-
-        driver.set_window_size(375, 812)
-        time.sleep(0.2)
-        width_mobile = driver.execute_script("return document.body.clientWidth;")
+    def test_homepage_loads_and_has_title(self, live_server, pw_page, level_config):
+        pw_page.goto(live_server.url + HOME_PATH, wait_until=PAGE_READY)
+        assert pw_page.title()
+
+    def test_layout_is_responsive_basic(self, live_server, pw_page, level_config):
+        pw_page.goto(live_server.url + HOME_PATH, wait_until=PAGE_READY)
+        pw_page.set_viewport_size({"width": 1366, "height": 800})
+        width_desktop = pw_page.evaluate("document.body.clientWidth")
+
+        pw_page.set_viewport_size({"width": 375, "height": 812})
+        _wait_for(pw_page, "w => document.body.clientWidth !== w", width_desktop)
+        width_mobile = pw_page.evaluate("document.body.clientWidth")
         assert width_desktop != width_mobile
 
-    def test_key_navigation_and_focus(self, live_server, driver, level_config):
-        url = live_server.url + HOME_PATH
-        driver.get(url)
-        body = driver.find_element(By.TAG_NAME, "body")
-        start_active = driver.switch_to.active_element
-        body.send_keys(Keys.TAB)
-        time.sleep(0.1)
-        after_tab = driver.switch_to.active_element
-        assert start_active != after_tab
-
-    def test_form_submit_smoke(self, live_server, driver, level_config):
-        url = live_server.url + HOME_PATH
-        driver.get(url)
-        inputs = driver.find_elements(By.CSS_SELECTOR, FORM_INPUT_SELECTOR)
-        submits = driver.find_elements(By.CSS_SELECTOR, FORM_SUBMIT_SELECTOR)
-        if not inputs or not submits:
+    def test_key_navigation_and_focus(self, live_server, pw_page, level_config):
+        pw_page.goto(live_server.url + HOME_PATH, wait_until=PAGE_READY)
+        start_active = pw_page.evaluate_handle("document.activeElement")
+        pw_page.keyboard.press("Tab")
+        moved = _wait_for(pw_page, "start => document.activeElement !== start", start_active)
+        assert moved, "Tab did not move focus"
+
+    def test_form_submit_smoke(self, live_server, pw_page, level_config):
+        pw_page.goto(live_server.url + HOME_PATH, wait_until=PAGE_READY)
+        form_input = pw_page.query_selector(FORM_INPUT_SELECTOR)
+        submit = pw_page.query_selector(FORM_SUBMIT_SELECTOR)
+        if form_input is None or submit is None:
             pytest.skip("Form selectors not present on this page")
-        inputs[0].clear()
-        inputs[0].send_keys("test")
-        submits[0].click()
-        time.sleep(0.3)
-        ok = driver.find_elements(By.CSS_SELECTOR, SUCCESS_MARKER_SELECTOR)
+        form_input.fill("test")
+        submit.click()
+        try:
+            pw_page.wait_for_selector(
+                SUCCESS_MARKER_SELECTOR, state="attached", timeout=WAIT_TIMEOUT_S * 1000
+            )
+            ok = True
+        except PlaywrightTimeoutError:
+            ok = False
         assert ok, "Expected success marker after form submit"
 
-    def test_no_obvious_js_errors_on_load(self, live_server, driver, level_config):
-        driver.get(live_server.url + HOME_PATH)
-        driver.execute_script(
-            """
-            window.__errors = [];
-            window.addEventListener('error', function(e){ window.__errors.push(e.message || 'error'); });
-            """
-        )
-        driver.get(live_server.url + HOME_PATH)
-        time.sleep(0.2)
-        errors = driver.execute_script("return window.__errors;") or []
+    def test_no_obvious_js_errors_on_load(self, live_server, pw_page, level_config):
+        # subscribed before the one navigation, so errors thrown while the
+        # page loads are caught too
+        errors = []
+        pw_page.on("pageerror", lambda e: errors.append(f"{e.name}: {e.message}"))
+        pw_page.goto(live_server.url + HOME_PATH, wait_until="load")
         assert all("ReferenceError" not in e for e in errors), f"JS errors: {errors}"
 
-    def test_navigation_perf_is_reasonable_for_level(self, live_server, driver, level_config):
+    @pytest.mark.browser_perf
+    @pytest.mark.skipif(os.environ.get("BROWSER_PERF", "0") != "1", reason="set BROWSER_PERF=1 to run")
+    def test_navigation_perf_is_reasonable_for_level(self, live_server, pw_page, level_config):
         """
         Uses PerformanceNavigationTiming if available; falls back to Navigation Timing.
         This doesn't replace real perf testing, but it flags obvious regressions as data scales.
         """
-        driver.get(live_server.url + HOME_PATH)
-        time.sleep(0.2)
+        pw_page.goto(live_server.url + HOME_PATH, wait_until="load")
 
-        nav_entry = driver.execute_script(
+        nav_entry = pw_page.evaluate(
             """
-            var e = (performance.getEntriesByType && performance.getEntriesByType('navigation')) || [];
-            if (e && e.length) {
-                var n = e[0];
-                return {
-                    dcl: n.domContentLoadedEventEnd, // ms from startTime(=0) for nav entries
-                    start: n.startTime
-                };
+            () => {
+                var e = (performance.getEntriesByType && performance.getEntriesByType('navigation')) || [];
+                if (e && e.length) {
+                    var n = e[0];
+                    return {
+                        dcl: n.domContentLoadedEventEnd, // ms from startTime(=0) for nav entries
+                        start: n.startTime
+                    };
+                }
+                return null;
             }
-            return null;
             """
         )
 
         if nav_entry and "dcl" in nav_entry and nav_entry["dcl"]:
             dcl_ms = float(nav_entry["dcl"])
         else:
-            timing = driver.execute_script("return window.performance && performance.timing ? performance.timing : null;")
+            timing = pw_page.evaluate("window.performance && performance.timing ? performance.timing.toJSON() : null")
             if not timing:
                 pytest.skip("No performance timing API available in this browser.")
             dcl_ms = float(timing.get("domContentLoadedEventEnd", 0) - timing.get("navigationStart", 0))
@@ -162,36 +193,47 @@ class TestBrowserUsability:
         threshold = level_config["nav_threshold_ms"]
         assert dcl_ms <= threshold, f"[{level_config['name']}] DOMContentLoaded {dcl_ms:.0f}ms > {threshold}ms"
 
-# Playwright Safari (WebKit) Tests
-HEADLESS = os.getenv("PW_HEADLESS", "1") == "1"   
-@pytest.mark.usefixtures("live_server")
+# Server-side responsiveness at scale, measured without a browser
+@pytest.fixture(scope="class")
+def server_client():
+    return Client()
+
+# Timed requests per check; the first (cold) request is made before these
+SERVER_TIMING_SAMPLES = 5
+
+class TestServerResponse:
+    def test_homepage_server_response_under_threshold(self, server_client, level_config):
+        # warm-up: the first request pays for URLconf import and template loading
+        server_client.get(HOME_PATH)
+        samples = []
+        for _ in range(SERVER_TIMING_SAMPLES):
+            t0 = time.perf_counter()
+            server_client.get(HOME_PATH)
+            samples.append((time.perf_counter() - t0) * 1000)
+        elapsed_ms = statistics.median(samples)
+
+        # no browser parse/render time here, so hold it to a fraction of the nav budget
+        threshold = level_config["nav_threshold_ms"] * 0.3
+        assert elapsed_ms <= threshold, f"[{level_config['name']}] median GET {HOME_PATH} {elapsed_ms:.0f}ms > {threshold:.0f}ms"
+
+# Safari (WebKit) specific checks, on the shared WebKit browser
+@pytest.mark.parametrize("pw_browser", [b for b in PW_BROWSERS if b == "webkit"], indirect=True)
+@pytest.mark.xdist_group("playwright-webkit")
 class TestSafariPlaywright:
-    def test_safari_homepage_loads(self, live_server):
-        with sync_playwright() as p:
-            browser = p.webkit.launch(headless=HEADLESS)
-            page = browser.new_page()
-            page.goto(live_server.url)
-            assert page.title(), "Safari/WebKit should have a non-empty title"
-            browser.close()
-
-    def test_safari_layout_responsive(self, live_server):
-        with sync_playwright() as p:
-            browser = p.webkit.launch(headless=HEADLESS)
-            page = browser.new_page()
-            page.goto(live_server.url)
-            desktop_width = page.evaluate("document.body.clientWidth")
-            page.set_viewport_size({"width": 375, "height": 812})
-            mobile_width = page.evaluate("document.body.clientWidth")
-            assert desktop_width != mobile_width
-            browser.close()
-
-    def test_safari_js_no_errors(self, live_server):
-        with sync_playwright() as p:
-            browser = p.webkit.launch(headless=HEADLESS)
-            page = browser.new_page()
-            errors = []
-            page.on("pageerror", lambda e: errors.append(str(e)))
-            page.goto(live_server.url)
-            page.wait_for_load_state("domcontentloaded")
-            assert not errors, f"JS errors: {errors}"
-            browser.close()
\ No newline at end of file
+    def test_safari_homepage_loads(self, live_server, pw_page):
+        pw_page.goto(live_server.url)
+        assert pw_page.title(), "Safari/WebKit should have a non-empty title"
+
+    def test_safari_layout_responsive(self, live_server, pw_page):
+        pw_page.goto(live_server.url)
+        desktop_width = pw_page.evaluate("document.body.clientWidth")
+        pw_page.set_viewport_size({"width": 375, "height": 812})
+        mobile_width = pw_page.evaluate("document.body.clientWidth")
+        assert desktop_width != mobile_width
+
+    def test_safari_js_no_errors(self, live_server, pw_page):
+        errors = []
+        pw_page.on("pageerror", lambda e: errors.append(str(e)))
+        pw_page.goto(live_server.url)
+        pw_page.wait_for_load_state("domcontentloaded")
+        assert not errors, f"JS errors: {errors}"
@@ -2,6 +2,7 @@
 import pytest
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from google.oauth2 import id_token as google_id_token
 
 VIEWS_MODULE = "my_app.views"
 
@@ -10,16 +11,16 @@ ALLOWED_DOMAIN = "bc.edu"
 
 ALLOWED_DOMAIN = "your-real-domain.com"
 
-# Mock googles token verification
+# Mock googles token verification; patched on the module object imported
+# above rather than re-resolving a dotted path every test
 @pytest.fixture
 def monkeypatch_google_verify(monkeypatch):
     def _set_payload(payload, raises=None):
-        target = "google.oauth2.id_token.verify_oauth2_token"
         def fake_verify(*args, **kwargs):
             if raises:
                 raise raises
             return payload
-        monkeypatch.setattr(target, fake_verify, raising=True)
+        monkeypatch.setattr(google_id_token, "verify_oauth2_token", fake_verify, raising=True)
     return _set_payload
 
 # checking for allowed domain
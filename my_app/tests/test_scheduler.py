@@ -3,36 +3,34 @@ import os
 import pytest
 from datetime import timedelta
 from django.utils import timezone
-from django.core.management import call_command
 
 from my_app.models import User, Course, CourseMember, Assessment
+import my_app.scheduler as sched
 
-# Per-test dataset via seed command 
-@pytest.fixture(autouse=True)
-def seed_scheduler_dataset(django_db_blocker):
+# Seeded dataset for the email test. The conftest session seed is reused when
+# it matches and is still present (live_server tests flush every table at
+# teardown); each test's own rows roll back with its transaction
+@pytest.fixture(scope="session")
+def seed_scheduler_dataset(ensure_seeded):
     semester = os.environ.get("TEST_SEMESTER", "Fall")
     year = os.environ.get("TEST_YEAR", "2025")
+    ensure_seeded(1, semester, int(year))
 
-    with django_db_blocker.unblock():
-        call_command(
-            "seed_data",
-            "--level", "1",
-            "--semester", semester,
-            "--year", year,
-            "--purge",
-        )
-    yield
+def _make_users(specs):
+    """Bulk-create users from (email, name, role) tuples in a single INSERT."""
+    return User.objects.bulk_create([
+        User(email=email, name=name, role=role) for email, name, role in specs
+    ])
 
 # Tests 
 @pytest.mark.django_db
-def test_send_12h_reminder_sends_to_all_course_members(monkeypatch):
+@pytest.mark.usefixtures("seed_scheduler_dataset")
+def test_send_12h_reminder_sends_to_all_course_members(monkeypatch, mailoutbox):
     """
     Integration-style test: uses seeded data from seed_data command.
     Publishes an assessment due within the scheduler's window and verifies
     one email is sent to all enrolled students in that course.
     """
-    import my_app.scheduler as sched
-
     fixed_now = timezone.now()
     monkeypatch.setattr(sched, "now", lambda: fixed_now)
 
@@ -56,38 +54,30 @@ def test_send_12h_reminder_sends_to_all_course_members(monkeypatch):
         due_date=fixed_now + timedelta(seconds=30),
     )
 
-    # Stub the email sender
-    sent = []
-
-    def fake_send_mail(subject, message, from_email, recipient_list, fail_silently):
-        sent.append({"subject": subject, "to": list(recipient_list)})
-        return len(recipient_list)
-
-    monkeypatch.setattr(sched, "send_mail", fake_send_mail)
-
-    # Run the job
+    # Run the job; the locmem email backend collects what it sends
     sched.send_12h_reminder()
 
     # One email to all members
-    assert len(sent) == 1
-    assert set(sent[0]["to"]) == set(emails)
-    assert "[Assessmate] Reminder" in sent[0]["subject"]
-    assert "HW1" in sent[0]["subject"]
+    assert len(mailoutbox) == 1
+    assert set(mailoutbox[0].to) == set(emails)
+    assert "[Assessmate] Reminder" in mailoutbox[0].subject
+    assert "HW1" in mailoutbox[0].subject
 
 
 @pytest.mark.django_db
-def test_send_12h_reminder_skips_when_not_due_or_not_published(monkeypatch):
+def test_send_12h_reminder_skips_when_not_due_or_not_published(monkeypatch, mailoutbox):
     """
     No emails if (A) due date is outside the window or (B) assessment is not published.
     Creates its own tiny objects alongside the seeded dataset.
     """
-    import my_app.scheduler as sched
-
     fixed_now = timezone.now()
     monkeypatch.setattr(sched, "now", lambda: fixed_now)
 
     # Independent course/user so we don't depend on the large seed for this case
-    teacher = User.objects.create(email="teacher2@example.com", name="Prof. Z", role="teacher")
+    teacher, student = _make_users([
+        ("teacher2@example.com", "Prof. Z", "teacher"),
+        ("s3@example.com", "S Three", "student"),
+    ])
     course = Course.objects.create(
         course_number="CS102",
         course_name="Data Structures",
@@ -95,32 +85,25 @@ def test_send_12h_reminder_skips_when_not_due_or_not_published(monkeypatch):
         course_year="2025",
         teacher=teacher,
     )
-    student = User.objects.create(email="s3@example.com", name="S Three", role="student")
-    CourseMember.objects.create(course=course, user=student)
-
-    # Case A: published but due too far in the future (> 1 minute)
-    Assessment.objects.create(
-        title="HW-Future",
-        course=course,
-        status="published",
-        due_date=fixed_now + timedelta(hours=2),
-    )
-
-    # Case B: within the window but not published
-    Assessment.objects.create(
-        title="HW-Draft",
-        course=course,
-        status="draft",
-        due_date=fixed_now + timedelta(seconds=30),
-    )
-
-    sent = []
-    monkeypatch.setattr(
-        sched,
-        "send_mail",
-        lambda *a, **k: sent.append({"to": list(k.get("recipient_list") or a[3])}),
-    )
+    CourseMember.objects.bulk_create([CourseMember(course=course, user=student)])
+
+    Assessment.objects.bulk_create([
+        # Case A: published but due too far in the future (> 1 minute)
+        Assessment(
+            title="HW-Future",
+            course=course,
+            status="published",
+            due_date=fixed_now + timedelta(hours=2),
+        ),
+        # Case B: within the window but not published
+        Assessment(
+            title="HW-Draft",
+            course=course,
+            status="draft",
+            due_date=fixed_now + timedelta(seconds=30),
+        ),
+    ])
 
     sched.send_12h_reminder()
 
-    assert sent == []
\ No newline at end of file
+    assert mailoutbox == []
\ No newline at end of file
@@ -6,17 +6,60 @@ Tests for SQL Injection and DoS vulnerabilities
 SIMPLIFIED VERSION - Matches original structure from prompt
 """
 
+import re
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import concurrent.futures
 import uuid
 from datetime import datetime
+from urllib.parse import quote
+
+# Independent probes (one endpoint each) run this many at a time
+PROBE_CONCURRENCY = 16
+# Keep-alive connections held per host; at least as many as any test's worker
+# threads, or the surplus ones reconnect on every request
+HTTP_POOL_SIZE = 64
 
 class SecurityTester:
+    # UUID-based endpoints probed for SQL injection; every {u} is a path param
+    SQLI_URL_TEMPLATES = (
+        # Teacher endpoints
+        "/teacher_dashboard/{u}/",
+        "/teacher_courses/{u}/",
+        "/new_course/{u}/",
+        "/teams_dashboard/{u}/",
+        "/assessment_dashboard/{u}/",
+        "/create_assessment/{u}/{u}/",
+        "/view_assessment/{u}/{u}/",
+        "/delete_course/{u}/{u}/",
+        "/teacher_view_results/{u}/{u}/{u}/",
+        
+        # Student endpoints
+        "/student_dashboard/{u}/",
+        "/student_courses/{u}/",
+        "/student_course_detail/{u}/{u}/",
+        "/student_take_assessment/{u}/{u}/{u}/",
+        "/student_view_results/{u}/{u}/{u}/",
+        
+        # Team endpoints
+        "/new_team/{u}/{u}/",
+        "/edit_team/{u}/{u}/{u}/",
+        "/delete_team/{u}/{u}/{u}/",
+    )
+    
     def __init__(self, base_url="http://localhost:8000"):
         self.base_url = base_url
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.results = []
+        # One case-insensitive pass over the body instead of lower() + a scan per indicator
+        self._sql_err_re = re.compile(
+            r"mysql|sqlite|postgresql|database error|sql syntax|query failed", re.IGNORECASE
+        )
+        self._sql_form_err_re = re.compile(r"mysql|sqlite|postgresql|sql syntax", re.IGNORECASE)
         
     def log_result(self, test_type, test_name, success, details=""):
         """Log test results"""
@@ -42,56 +85,37 @@ class SecurityTester:
             "' UNION SELECT * FROM users--",
         ]
         
-        # Test ALL your UUID-based endpoints
+        # Payloads are URL-encoded once and formatted into each template
+        encoded_payloads = [quote(p, safe="") for p in payloads]
         fake_uuid = str(uuid.uuid4())
-        endpoints = [
-            # Teacher endpoints
-            f"/teacher_dashboard/{fake_uuid}/",
-            f"/teacher_courses/{fake_uuid}/",
-            f"/new_course/{fake_uuid}/",
-            f"/teams_dashboard/{fake_uuid}/",
-            f"/assessment_dashboard/{fake_uuid}/",
-            f"/create_assessment/{fake_uuid}/{fake_uuid}/",
-            f"/view_assessment/{fake_uuid}/{fake_uuid}/",
-            f"/delete_course/{fake_uuid}/{fake_uuid}/",
-            f"/teacher_view_results/{fake_uuid}/{fake_uuid}/{fake_uuid}/",
-            
-            # Student endpoints
-            f"/student_dashboard/{fake_uuid}/",
-            f"/student_courses/{fake_uuid}/",
-            f"/student_course_detail/{fake_uuid}/{fake_uuid}/",
-            f"/student_take_assessment/{fake_uuid}/{fake_uuid}/{fake_uuid}/",
-            f"/student_view_results/{fake_uuid}/{fake_uuid}/{fake_uuid}/",
-            
-            # Team endpoints
-            f"/new_team/{fake_uuid}/{fake_uuid}/",
-            f"/edit_team/{fake_uuid}/{fake_uuid}/{fake_uuid}/",
-            f"/delete_team/{fake_uuid}/{fake_uuid}/{fake_uuid}/",
-        ]
         
-        for endpoint in endpoints:
-            for payload in payloads:
+        def probe(template):
+            endpoint = template.format(u=fake_uuid)
+            outcomes = []
+            for payload in encoded_payloads:
                 try:
-                    # Replace UUID in endpoint with SQL injection payload
-                    url = self.base_url + endpoint.replace(fake_uuid, payload)
+                    # Put the SQL injection payload in every UUID position
+                    url = self.base_url + template.format(u=payload)
                     response = self.session.get(url, timeout=5)
                     
                     # Check for SQL errors
-                    error_indicators = [
-                        "mysql", "sqlite", "postgresql", "database error",
-                        "sql syntax", "query failed"
-                    ]
-                    
-                    if any(indicator in response.text.lower() for indicator in error_indicators):
-                        self.log_result("SQL Injection", f"URL param in {endpoint}", False,
-                                     f"SQL ERROR EXPOSED")
+                    if self._sql_err_re.search(response.text):
+                        outcomes.append(("SQL Injection", f"URL param in {endpoint}", False,
+                                         f"SQL ERROR EXPOSED"))
                     else:
-                        self.log_result("SQL Injection", f"URL param in {endpoint}", True)
+                        outcomes.append(("SQL Injection", f"URL param in {endpoint}", True))
                         break  # One pass is enough per endpoint
                         
                 except Exception as e:
                     if "404" not in str(e):
-                        self.log_result("SQL Injection", f"URL test: {endpoint}", False, str(e))
+                        outcomes.append(("SQL Injection", f"URL test: {endpoint}", False, str(e)))
+            return outcomes
+        
+        # Endpoints are probed concurrently; results are logged in endpoint order
+        with concurrent.futures.ThreadPoolExecutor(max_workers=PROBE_CONCURRENCY) as executor:
+            for outcomes in executor.map(probe, self.SQLI_URL_TEMPLATES):
+                for outcome in outcomes:
+                    self.log_result(*outcome)
 
     def test_sql_injection_forms(self):
         """Test SQL injection on form submissions"""
@@ -111,9 +135,7 @@ class SecurityTester:
             url = f"{self.base_url}/new_course/{fake_uuid}/"
             response = self.session.post(url, data=course_data, timeout=5)
             
-            error_indicators = ["mysql", "sqlite", "postgresql", "sql syntax"]
-            
-            if any(indicator in response.text.lower() for indicator in error_indicators):
+            if self._sql_form_err_re.search(response.text):
                 self.log_result("SQL Injection", "Course form", False, "SQL error detected")
             else:
                 self.log_result("SQL Injection", "Course form", True)
@@ -163,52 +185,62 @@ class SecurityTester:
             f"/teacher_chat/",
         ]
         
-        for endpoint in protected_endpoints:
+        def probe(endpoint):
             try:
                 url = self.base_url + endpoint
                 response = self.session.get(url, timeout=5, allow_redirects=False)
                 
                 # Should redirect to login or return 401/403
                 if response.status_code == 200:
-                    self.log_result("Auth Bypass", f"Endpoint {endpoint}", False,
-                                 "Accessible without authentication")
+                    return ("Auth Bypass", f"Endpoint {endpoint}", False,
+                            "Accessible without authentication")
                 elif response.status_code in [302, 401, 403]:
-                    self.log_result("Auth Bypass", f"Endpoint {endpoint}", True,
-                                 f"Protected (Status: {response.status_code})")
+                    return ("Auth Bypass", f"Endpoint {endpoint}", True,
+                            f"Protected (Status: {response.status_code})")
                     
             except Exception as e:
                 if "404" not in str(e):
-                    self.log_result("Auth Bypass", f"Test error: {endpoint}", False, str(e))
+                    return ("Auth Bypass", f"Test error: {endpoint}", False, str(e))
+            return None
+        
+        # Endpoints are probed concurrently; results are logged in endpoint order
+        with concurrent.futures.ThreadPoolExecutor(max_workers=PROBE_CONCURRENCY) as executor:
+            for outcome in executor.map(probe, protected_endpoints):
+                if outcome is not None:
+                    self.log_result(*outcome)
 
-    def test_dos_sustained_load(self, endpoint="/", concurrency=20, duration_seconds=8):
+    def test_dos_sustained_load(self, endpoint="/", concurrency=20, duration_seconds=8, interval_seconds=0.1):
         """Test DoS with sustained load"""
         print(f"\nTesting DoS: {concurrency} concurrent requests for {duration_seconds}s...")
         
         url = self.base_url + endpoint
-        stop_time = time.time() + duration_seconds
-        
-        total_sent = 0
-        total_success = 0
-        total_errors = 0
+        stop_time = time.monotonic() + duration_seconds
         
-        def single_request():
-            nonlocal total_sent, total_success, total_errors
-            try:
-                r = self.session.get(url, timeout=8)
-                total_sent += 1
-                if 200 <= r.status_code < 400:
-                    total_success += 1
-                else:
-                    total_errors += 1
-            except:
-                total_sent += 1
-                total_errors += 1
+        # Each worker sends at most one request per interval until stop_time,
+        # so nothing queues up behind the pool, and counts its own results
+        def worker():
+            sent = success = errors = 0
+            while time.monotonic() < stop_time:
+                started = time.monotonic()
+                try:
+                    r = self.session.get(url, timeout=8)
+                    if 200 <= r.status_code < 400:
+                        success += 1
+                    else:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                sent += 1
+                time.sleep(max(0.0, interval_seconds - (time.monotonic() - started)))
+            return sent, success, errors
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
-            while time.time() < stop_time:
-                for _ in range(concurrency):
-                    executor.submit(single_request)
-                time.sleep(0.1)
+            futures = [executor.submit(worker) for _ in range(concurrency)]
+            counts = [f.result() for f in futures]
+        
+        total_sent = sum(c[0] for c in counts)
+        total_success = sum(c[1] for c in counts)
+        total_errors = sum(c[2] for c in counts)
         
         success_rate = (total_success / total_sent * 100) if total_sent else 0
         
@@ -0,0 +1,43 @@
+# test_seed_data.py
+import random
+
+import numpy as np
+import pytest
+
+from my_app.management.commands.seed_data import (
+    LEVEL_CONFIG,
+    biased_scores,
+    partition_into_teams,
+)
+
+# Pure helpers; no database needed
+
+
+@pytest.mark.parametrize("level", sorted(LEVEL_CONFIG))
+def test_partition_into_teams_stays_within_team_bounds(level):
+    cfg = LEVEL_CONFIG[level]
+    team_min, team_max = cfg["team_min"], cfg["team_max"]
+    rng = random.Random(42)
+
+    # every class size the seeder can draw for this level
+    for n in range(cfg["students_min"], cfg["students_max"] + 1):
+        sizes = partition_into_teams(n, team_min, team_max, rng)
+        assert sum(sizes) == n
+        assert all(team_min <= s <= team_max for s in sizes), (n, sizes)
+
+
+def test_partition_into_teams_small_classes():
+    rng = random.Random(42)
+    assert partition_into_teams(0, 4, 6, rng) == []
+    # fewer students than a minimum team still get one team
+    assert partition_into_teams(3, 4, 6, rng) == [3]
+
+
+@pytest.mark.parametrize("max_score", [3, 5, 10])
+def test_biased_scores_stay_within_bounds(max_score):
+    scores = biased_scores(np.random.default_rng(42), 10000, max_score=max_score)
+    assert scores.shape == (10000,)
+    assert scores.min() >= 1
+    assert scores.max() <= max_score
+    # biased toward the top of the scale
+    assert scores.mean() > (1 + max_score) / 2
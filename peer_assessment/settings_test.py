@@ -3,14 +3,28 @@ from .settings import *
 TESTING = True
 import os
 
-# Force SQLite for tests
+# Force SQLite for tests. Django runs a :memory: test DB as a shared-cache
+# in-memory URI, so every connection (incl. live_server's) sees the same data.
+# Test DBs are throwaway, so trade durability for faster commits
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": ":memory:",
+        "OPTIONS": {
+            "init_command": (
+                "PRAGMA synchronous=OFF;"
+                "PRAGMA journal_mode=MEMORY;"
+                "PRAGMA temp_store=MEMORY;"
+            ),
+        },
     }
 }
 
+# Opt-in file-backed test DB so `pytest --reuse-db` can keep the seeded
+# dataset between runs, e.g. TEST_DB_FILE=.pytest_db.sqlite3 pytest --reuse-db
+if os.environ.get("TEST_DB_FILE"):
+    DATABASES["default"]["TEST"] = {"NAME": os.environ["TEST_DB_FILE"]}
+
 
 
 # for email in scheduler
@@ -20,3 +34,18 @@ EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
 os.environ.setdefault("OPENAI_API_KEY", "dummy")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+ALLOWED_HOSTS = ["*"]
+
+
+class DisableMigrations:
+    """Build the test schema straight from the models instead of replaying migrations"""
+
+    def __contains__(self, item):
+        return True
+
+    def __getitem__(self, item):
+        return None
+
+
+MIGRATION_MODULES = DisableMigrations()